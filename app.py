@@ -1,16 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from contextlib import aclosing, asynccontextmanager
+from typing import Annotated, List
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_huggingface import HuggingFaceEndpoint
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
 
+# Load .env before importing modules that read their settings at import time
 load_dotenv()
 
+import metrics
+from llm import generate_policy, inflight, registry, stream_policy
+from policies import categories, parse_field, parse_policy, validate_categories
+from rules import fixed_fields, match_rule, needs_model, rule_policy, validate_rules
+
 sec_key = os.getenv('HF_TOKEN')
+# Maximum items accepted by /policies/batch and how many of them run at once
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+# Fraction of policy requests written to the log
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("policy")
+
+@asynccontextmanager
+async def lifespan(app):
+    validate_categories()
+    validate_rules(categories)
+    registry.start({route: category.prompt for route, category in categories.items()}, token=sec_key)
+    yield
+    registry.close()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 #Cors middleware
 app.add_middleware(
@@ -25,230 +54,169 @@ app.add_middleware(
 async def hello():
     return "welcome"
 
-@app.post("/general")
-async def general(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-    #prompt template
-    general_question = """Generate a single general return policy for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. Include a return window (in days), condition requirements, and any special notes. Be stricter for lower scores and more lenient for higher scores like Longer return window and lenient condition requirements for high score customers. Dont exceed 30 days.Format the output as:
-    Return Window: [X days]
-    Condition Requirements: [requirements]
-    Special Notes: [notes]"""
-
-    general_policy_prompt_template = PromptTemplate(template=general_question, input_variables=["customer_id", "customer_score"])
-
-    general_policy_chain = LLMChain(llm=llm, prompt = general_policy_prompt_template)
-
-    raw_general_policy = general_policy_chain.invoke({"customer_id":customer_id, "customer_score":customer_score})
-
-    # Parse the raw general policy
-    lines = raw_general_policy['text'].strip().split('\n')
-    general_return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    general_condition = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition Requirements')), "Item must be in original condition")
-    general_special_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Special Notes')), "No special notes")
-
-    return {"Return_Window": general_return_window, "Condition_requirements": general_condition, "Special_notes": general_special_notes}
-
-
-
-@app.post("/tv")
-async def electronics(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-
-    category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
-    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
-    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer. For electronics don't give return for low customer scores, instead give replacement for genuine cases.
-    Return Window: Specify the time frame within which returns are accepted for that customer.
-    Condition of Items: Mention the condition in which items must be returned for that customer.
-    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
-    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
-    Additional Notes: Include any additional notes relevant to the return policy for that customer.
-    """
-    category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category"])
-    category_policy_chain = LLMChain(llm=llm, prompt = category_policy_prompt_template)
-
-    response = category_policy_chain.invoke({"customer_score": customer_score, "customer_id": customer_id, "category": "Tv, Appliances, Electronics"})
-
-    electronics_policy = response['text']
-
-    lines = electronics_policy.strip("-").strip().split('\n')
-    pay_on_delivery = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Pay on delivery')), "Yes, this is available {customer_id}")
-    returnable = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Returnable')), "Yes, the customer can return electronics.")
-    return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    condition_of_items = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "The items must be in their original packaging and unused for a return to be accepted.")
-    exceptions = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost.")
-    refunds_exchanges = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "We will process refunds within 3-5 business days of receiving the returned item.")
-    additional_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "For electronics, we recommend checking the product thoroughly upon delivery to ensure it's in working order before signing for it. If you notice any issues, please contact us immediately.")
-
-    return {"Pay_on_delivery": pay_on_delivery, "Returnable": returnable, "Return_window": return_window, "Condition_of_items": condition_of_items, "Exceptions": exceptions, "Refunds_exchanges": refunds_exchanges, "additional_notes": additional_notes}
-
-@app.post("/fashion")
-async def fashion(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-
-    category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
-    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
-    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer.
-    Return Window: Specify the time frame within which returns are accepted for that customer.
-    Condition of Items: Mention the condition in which items must be returned for that customer.
-    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
-    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
-    Additional Notes: Include any additional notes relevant to the return policy for that customer.
-    """
-    category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category"])
-    category_policy_chain = LLMChain(llm=llm, prompt = category_policy_prompt_template)
-
-    response = category_policy_chain.invoke({"customer_score": customer_score, "customer_id": customer_id, "category": "fashion"})
-
-    fashion_policy = response['text']
-    print(fashion_policy)
-
-    lines = fashion_policy.strip('-').strip().split('\n')
-    print(lines)
-    pay_on_delivery = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Pay on delivery')), "Yes, this is available {customer_id}")
-    returnable = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Returnable')), "Yes, the customer can return fashion.")
-    return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    condition_of_items = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "The items must be in their original packaging and unused for a return to be accepted.")
-    exceptions = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost.")
-    refunds_exchanges = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "We will process refunds within 3-5 business days of receiving the returned item.")
-    additional_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "For Fashion, we recommend checking the product thoroughly upon delivery to ensure it's in right condition before signing for it. If you notice any issues, please contact us immediately.")
-
-    return {"Pay_on_delivery": pay_on_delivery, "Returnable": returnable, "Return_window": return_window, "Condition_of_items": condition_of_items, "Exceptions": exceptions, "Refunds_exchanges": refunds_exchanges, "additional_notes": additional_notes}
-
-@app.post("/medicine")
-async def medicine(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-
-    category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
-    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
-    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer.
-    Return Window: Specify the time frame within which returns are accepted for that customer.
-    Condition of Items: Mention the condition in which items must be returned for that customer.
-    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
-    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
-    Additional Notes: Include any additional notes relevant to the return policy for that customer.
-    """
-    category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category"])
-    category_policy_chain = LLMChain(llm=llm, prompt = category_policy_prompt_template)
-
-    response = category_policy_chain.invoke({"customer_score": customer_score, "customer_id": customer_id, "category": "medicine"})
-
-    medicine_policy = response['text']
-    print(medicine_policy)
-
-    lines = medicine_policy.strip('-').strip().split('\n')
-    print(lines)
-    pay_on_delivery = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Pay on delivery')), "Yes, this is available for that customer.")
-    returnable = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Returnable')), "Yes, the customer can return medicine provided not opening them.")
-    return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    condition_of_items = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "The items must be in their original packaging and unused for a return to be accepted.")
-    exceptions = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost.")
-    refunds_exchanges = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "We will process refunds within 3-5 business days of receiving the returned item.")
-    additional_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "For medicak, we recommend not opening the items if you notice any issues, please contact us immediately.")
-
-    return {"Pay_on_delivery": pay_on_delivery, "Returnable": returnable, "Return_window": return_window, "Condition_of_items": condition_of_items, "Exceptions": exceptions, "Refunds_exchanges": refunds_exchanges, "additional_notes": additional_notes}
-
-@app.post("/beauty")
-async def beauty(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-
-    category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
-    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
-    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer.
-    Return Window: Specify the time frame within which returns are accepted for that customer.
-    Condition of Items: Mention the condition in which items must be returned for that customer.
-    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
-    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
-    Additional Notes: Include any additional notes relevant to the return policy for that customer.
-    """
-    category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category"])
-    category_policy_chain = LLMChain(llm=llm, prompt = category_policy_prompt_template)
-
-    response = category_policy_chain.invoke({"customer_score": customer_score, "customer_id": customer_id, "category": "beauty and personal"})
-
-    beauty_policy = response['text']
-    print(beauty_policy)
-
-    lines = beauty_policy.strip('-').strip().split('\n')
-    print(lines)
-    pay_on_delivery = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Pay on delivery')), "Yes, this is available for that customer.")
-    returnable = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Returnable')), "Yes, the customer can return beauty products provided not using them.")
-    return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    condition_of_items = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "The items must be in their original packaging and unused for a return to be accepted.")
-    exceptions = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost.")
-    refunds_exchanges = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "We will process refunds within 3-5 business days of receiving the returned item.")
-    additional_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "For beauty and personal products, we recommend not opening the items if you notice any issues, please contact us immediately.")
-
-    return {"Pay_on_delivery": pay_on_delivery, "Returnable": returnable, "Return_window": return_window, "Condition_of_items": condition_of_items, "Exceptions": exceptions, "Refunds_exchanges": refunds_exchanges, "additional_notes": additional_notes}
-
-@app.post("/toy")
-async def toy(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-
-    category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
-    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
-    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer.
-    Return Window: Specify the time frame within which returns are accepted for that customer.
-    Condition of Items: Mention the condition in which items must be returned for that customer.
-    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
-    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
-    Additional Notes: Include any additional notes relevant to the return policy for that customer.
-    """
-    category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category"])
-    category_policy_chain = LLMChain(llm=llm, prompt = category_policy_prompt_template)
-
-    response = category_policy_chain.invoke({"customer_score": customer_score, "customer_id": customer_id, "category": "toys and games"})
-
-    toys_policy = response['text']
-    print(toys_policy)
-
-    lines = toys_policy.strip('-').strip().split('\n')
-    print(lines)
-    pay_on_delivery = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Pay on delivery')), "Yes, this is available for that customer.")
-    returnable = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Returnable')), "Yes, the customer can return toys and games provided not using them.")
-    return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    condition_of_items = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "The items must be in their original packaging and unused for a return to be accepted.")
-    exceptions = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost.")
-    refunds_exchanges = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "We will process refunds within 3-5 business days of receiving the returned item.")
-    additional_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "For toys and games, we recommend not opening the items if you notice any issues, please contact us immediately.")
-
-    return {"Pay_on_delivery": pay_on_delivery, "Returnable": returnable, "Return_window": return_window, "Condition_of_items": condition_of_items, "Exceptions": exceptions, "Refunds_exchanges": refunds_exchanges, "additional_notes": additional_notes}
-
-@app.post("/sports")
-async def sports(customer_id: str, customer_score: float):
-    repo_id = "mistralai/Mistral-7B-Instruct-v0.3"
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=700, temperature=0.8, huggingfacehub_api_token=sec_key)
-
-    category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
-    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
-    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer.
-    Return Window: Specify the time frame within which returns are accepted for that customer.
-    Condition of Items: Mention the condition in which items must be returned for that customer.
-    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
-    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
-    Additional Notes: Include any additional notes relevant to the return policy for that customer.
-    """
-    category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category"])
-    category_policy_chain = LLMChain(llm=llm, prompt = category_policy_prompt_template)
-
-    response = category_policy_chain.invoke({"customer_score": customer_score, "customer_id": customer_id, "category": "toys and games"})
-
-    toys_policy = response['text']
-    print(toys_policy)
-
-    lines = toys_policy.strip('-').strip().split('\n')
-    print(lines)
-    pay_on_delivery = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Pay on delivery')), "Yes, this is available for that customer.")
-    returnable = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Returnable')), "Yes, the customer can return sports and outdoors provided not using them.")
-    return_window = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Return Window')), "14 days")
-    condition_of_items = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "The items must be in their original packaging and unused for a return to be accepted.")
-    exceptions = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost.")
-    refunds_exchanges = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "We will process refunds within 3-5 business days of receiving the returned item.")
-    additional_notes = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith('Condition of Items')), "For sports and outdoors, we recommend not opening the items if you notice any issues, please contact us immediately.")
-
-    return {"Pay_on_delivery": pay_on_delivery, "Returnable": returnable, "Return_window": return_window, "Condition_of_items": condition_of_items, "Exceptions": exceptions, "Refunds_exchanges": refunds_exchanges, "additional_notes": additional_notes}
\ No newline at end of file
+@app.get("/cache/stats")
+async def cache_stats():
+    # "coalesced" counts requests that joined a generation already in flight
+    return {**registry.cache.stats(), "coalesced": inflight.coalesced}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    stats = registry.cache.stats()
+    return metrics.render({
+        "policy_cache_hits_total": ("Policy cache lookups served from the cache.", stats["hits"]),
+        "policy_cache_misses_total": ("Policy cache lookups not served from the cache, including requests that then joined an in-flight generation (see policy_coalesced_total).", stats["misses"]),
+        "policy_coalesced_total": ("Requests that joined a generation already in flight.", inflight.coalesced),
+    })
+
+# nan/inf parse as floats but cannot be bucketed or compared against rules: reject with 422
+Score = Annotated[float, Query(allow_inf_nan=False)]
+
+def log_policy(route, source, elapsed, fallbacks, streamed=False):
+    if random.random() < LOG_SAMPLE_RATE:
+        logger.info("policy route=%s source=%s streamed=%s total_ms=%.1f fallbacks=%s", route, source, streamed, elapsed * 1000, ",".join(fallbacks) or "-")
+
+async def get_policy(category, customer_id, customer_score):
+    # A request that fails before producing a policy is recorded with source "none"
+    with metrics.Timer(metrics.request_seconds, category.route, "none") as timer:
+        policy, fallbacks, source = await build_policy(category, customer_id, customer_score)
+        timer.labels = (category.route, source)
+    log_policy(category.route, source, timer.elapsed, fallbacks)
+    return policy, fallbacks, source
+
+async def build_policy(category, customer_id, customer_score):
+    # Returns the policy, the fields that fell back to defaults and the path that
+    # produced it: "rules", "hybrid" (rules plus model free text) or "llm"
+    rule = match_rule(category.route, customer_score)
+    if rule is not None and not needs_model(rule):
+        policy, source = rule_policy(category, rule, customer_id)
+        return policy, [], source
+
+    policy_text = await generate_policy(category.route, customer_id, customer_score)
+    logger.debug("model output route=%s text=%r", category.route, policy_text)
+    parse_start = time.perf_counter()
+    policy, fallbacks = parse_policy(policy_text, category, customer_id)
+    metrics.parse_seconds.observe(time.perf_counter() - parse_start, category.route)
+    if rule is None:
+        return policy, fallbacks, "llm"
+    policy, source = rule_policy(category, rule, customer_id, generated=policy)
+    return policy, [key for key in fallbacks if rule[key] is None], source
+
+def policy_route(category):
+    async def handler(customer_id: str, customer_score: Score, response: Response):
+        policy, fallbacks, source = await get_policy(category, customer_id, customer_score)
+        # Fields the model did not produce and were filled from defaults
+        response.headers["X-Policy-Fallbacks"] = ",".join(fallbacks)
+        response.headers["X-Policy-Source"] = source
+        return policy
+    handler.__name__ = category.name
+    return handler
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def policy_events(category, customer_id, customer_score):
+    # token events as text arrives, a field event as soon as each field's line
+    # completes, then the fully parsed policy
+    start = time.perf_counter()
+    text = ""
+    line = ""
+    emitted = set()
+
+    def field_event(key, value):
+        if not emitted:
+            metrics.first_field_seconds.observe(time.perf_counter() - start, category.route)
+        emitted.add(key)
+        return sse("field", {"key": key, "value": value})
+
+    def policy_event(policy, fallbacks, source):
+        timer.labels = (category.route, source)
+        log_policy(category.route, source, time.perf_counter() - start, fallbacks, streamed=True)
+        return sse("policy", {"policy": policy, "fallbacks": fallbacks, "source": source})
+
+    rule = match_rule(category.route, customer_score)
+    # Recorded when the stream ends, including errors and clients that disconnect;
+    # a stream that fails before producing a policy has source "none"
+    with metrics.Timer(metrics.request_seconds, category.route, "none") as timer:
+        try:
+            if rule is not None:
+                for key, value in fixed_fields(rule, customer_id).items():
+                    yield field_event(key, value)
+                if not needs_model(rule):
+                    policy, source = rule_policy(category, rule, customer_id)
+                    yield policy_event(policy, [], source)
+                    return
+
+            # Closed explicitly so a disconnected client frees its LLM slot right away
+            async with aclosing(stream_policy(category.route, customer_id, customer_score)) as chunks:
+                async for chunk in chunks:
+                    yield sse("token", {"text": chunk})
+                    text += chunk
+                    *complete, line = (line + chunk).split("\n")
+                    for done in complete:
+                        field = parse_field(done, category)
+                        if field is not None and field[0] not in emitted:
+                            yield field_event(*field)
+            parse_start = time.perf_counter()
+            policy, fallbacks = parse_policy(text, category, customer_id)
+            metrics.parse_seconds.observe(time.perf_counter() - parse_start, category.route)
+            source = "llm"
+            if rule is not None:
+                policy, source = rule_policy(category, rule, customer_id, generated=policy)
+                fallbacks = [key for key in fallbacks if rule[key] is None]
+            for key, value in policy.items():
+                if key not in emitted and key not in fallbacks:
+                    yield field_event(key, value)
+            yield policy_event(policy, fallbacks, source)
+        except HTTPException as exc:
+            timer.outcome = metrics.outcome(exc)
+            yield sse("error", {"error": exc.detail})
+        except Exception as exc:
+            timer.outcome = metrics.outcome(exc)
+            yield sse("error", {"error": str(exc) or type(exc).__name__})
+
+def policy_stream_route(category):
+    async def handler(customer_id: str, customer_score: Score):
+        return StreamingResponse(policy_events(category, customer_id, customer_score), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    handler.__name__ = f"{category.name}_stream"
+    return handler
+
+# One route per configured category, e.g. /general, /tv, /fashion, plus a
+# server-sent events variant (GET so browsers can use EventSource)
+for category in categories.values():
+    app.post(f"/{category.route}")(policy_route(category))
+    app.api_route(f"/{category.route}/stream", methods=["GET", "POST"])(policy_stream_route(category))
+
+class PolicyRequest(BaseModel):
+    customer_id: str
+    customer_score: float
+    category: str
+
+@app.post("/policies/batch")
+async def policies_batch(items: List[PolicyRequest]):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(item):
+        category = categories.get(item.category)
+        if category is None:
+            return {"policy": None, "fallbacks": [], "source": None, "error": f"Unknown category '{item.category}'"}
+        if not math.isfinite(item.customer_score):
+            # Checked per item so the rest of the batch still runs
+            return {"policy": None, "fallbacks": [], "source": None, "error": "customer_score must be a finite number"}
+        async with slots:
+            try:
+                policy, fallbacks, source = await get_policy(category, item.customer_id, item.customer_score)
+                return {"policy": policy, "fallbacks": fallbacks, "source": source, "error": None}
+            except HTTPException as exc:
+                return {"policy": None, "fallbacks": [], "source": None, "error": exc.detail}
+            except Exception as exc:
+                return {"policy": None, "fallbacks": [], "source": None, "error": str(exc) or type(exc).__name__}
+
+    # Identical items are generated once and fanned back out in request order
+    unique = {(item.category, item.customer_id, item.customer_score): item for item in items}
+    results = dict(zip(unique, await asyncio.gather(*(run(item) for item in unique.values()))))
+
+    # A non-finite score cannot be written back out as JSON, so it is echoed as null
+    return [{"customer_id": item.customer_id, "customer_score": item.customer_score if math.isfinite(item.customer_score) else None, "category": item.category, **results[(item.category, item.customer_id, item.customer_score)]} for item in items]
@@ -0,0 +1,41 @@
+"""Parses the recorded model outputs in corpus/ with the single-pass parser and the old per-field line scans.
+
+Correctness against the corpus is covered by tests/test_parser.py. Run from the repository root:
+
+    python benchmarks/bench_parser.py [iterations]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from policies import categories, parse_policy
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "policy_outputs.json")
+
+
+def legacy_parse(text, fields):
+    # The generator scans the handlers used before the single-pass parser
+    lines = text.strip('-').strip().split('\n')
+    policy = {}
+    for label, key, fallback in fields:
+        try:
+            policy[key] = next((line.split(': ')[1].strip() for line in lines if line.strip().startswith(label)), fallback)
+        except IndexError:
+            policy[key] = fallback
+    return policy
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+
+    samples = [(entry["text"], categories[entry["category"]]) for entry in corpus]
+    legacy = timeit.timeit(lambda: [legacy_parse(text, category.fields) for text, category in samples], number=iterations)
+    single = timeit.timeit(lambda: [parse_policy(text, category, "corpus") for text, category in samples], number=iterations)
+    per_output = 1e6 / (iterations * len(samples))
+    print(f"{'line scans':<16}{legacy * per_output:8.2f} us/output")
+    print(f"{'single pass':<16}{single * per_output:8.2f} us/output")
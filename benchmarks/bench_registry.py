@@ -0,0 +1,69 @@
+"""Per-request overhead of building the endpoint, prompt and chain on every call vs. the startup registry.
+
+Run from the repository root:
+
+    python benchmarks/bench_registry.py [requests]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_endpoint import serve
+
+server, url = serve()
+os.environ['LLM_ENDPOINT_URL'] = url
+
+import requests
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain_huggingface import HuggingFaceEndpoint
+
+from llm import registry
+from policies import categories, category_question
+
+# Building an endpoint per request repeats the max_length warning on every call
+logging.getLogger("langchain_huggingface").setLevel(logging.ERROR)
+
+inputs = {"customer_id": "bench", "customer_score": 72.5}
+
+
+def per_request():
+    llm = HuggingFaceEndpoint(endpoint_url=url, max_length=700, temperature=0.8)
+    prompt = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category", "returnable_note"])
+    chain = LLMChain(llm=llm, prompt=prompt)
+    return chain.invoke({**inputs, "category": "fashion", "returnable_note": ""})
+
+
+def from_registry():
+    return registry.chains["fashion"].invoke(inputs)
+
+
+def raw_http():
+    session.post(url, json={"inputs": "bench", "parameters": {}}).content
+
+
+def timed(fn, n):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1000
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    session = requests.Session()
+    registry.start({route: category.prompt for route, category in categories.items()})
+
+    baseline = timed(raw_http, n)
+    before = timed(per_request, n)
+    after = timed(from_registry, n)
+    registry.close()
+    server.shutdown()
+
+    print(f"{'raw HTTP to stub':<28}{baseline:8.3f} ms/request")
+    print(f"{'build per request':<28}{before:8.3f} ms/request  overhead {before - baseline:8.3f} ms")
+    print(f"{'startup registry':<28}{after:8.3f} ms/request  overhead {after - baseline:8.3f} ms")
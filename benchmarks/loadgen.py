@@ -0,0 +1,124 @@
+"""Drives every policy route and reports p50/p95/p99 latency and requests per second.
+
+Against a running server:
+
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --requests 2000 --concurrency 64
+
+Or fully offline, starting the mock endpoint and the app in-process:
+
+    python benchmarks/loadgen.py --local --latency 0.5 --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+ROUTES = ["general", "tv", "fashion", "medicine", "beauty", "toy", "sports"]
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile of an already sorted list
+    return samples[min(len(samples) - 1, max(0, round(pct / 100 * len(samples)) - 1))]
+
+
+def request_plan(n, customers, batch_size):
+    # Round-robin over every route kind so each gets a comparable share of load
+    kinds = [("hello", None)] + [("policy", route) for route in ROUTES] + [("stream", route) for route in ROUTES] + [("batch", None)]
+    for i in range(n):
+        kind, route = kinds[i % len(kinds)]
+        customer = f"c{random.randrange(customers)}"
+        score = round(random.uniform(0, 100), 1)
+        if kind == "hello":
+            yield "GET /hello", ("GET", "/hello", {}, None)
+        elif kind == "policy":
+            yield f"POST /{route}", ("POST", f"/{route}", {"customer_id": customer, "customer_score": score}, None)
+        elif kind == "stream":
+            yield f"GET /{route}/stream", ("GET", f"/{route}/stream", {"customer_id": customer, "customer_score": score}, None)
+        else:
+            items = [{"customer_id": f"c{random.randrange(customers)}", "customer_score": round(random.uniform(0, 100), 1), "category": random.choice(ROUTES)} for _ in range(batch_size)]
+            yield "POST /policies/batch", ("POST", "/policies/batch", {}, items)
+
+
+async def run(url, n, concurrency, customers, batch_size, timeout):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    plan = iter(request_plan(n, customers, batch_size))
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            for name, (method, path, params, body) in plan:
+                start = time.perf_counter()
+                try:
+                    # Streams are read to the end so the latency covers the whole response
+                    async with client.stream(method, path, params=params, json=body) as response:
+                        async for _ in response.aiter_bytes():
+                            pass
+                    if response.status_code >= 400:
+                        errors[name] += 1
+                except httpx.HTTPError:
+                    errors[name] += 1
+                latencies[name].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def report(latencies, errors, elapsed):
+    print(f"{'route':<24}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    everything = []
+    for name in sorted(latencies):
+        samples = sorted(latencies[name])
+        everything += samples
+        print(f"{name:<24}{len(samples):>9}{errors[name]:>8}{percentile(samples, 50) * 1000:>10.1f}{percentile(samples, 95) * 1000:>10.1f}{percentile(samples, 99) * 1000:>10.1f}{len(samples) / elapsed:>10.1f}")
+    everything.sort()
+    print(f"{'all':<24}{len(everything):>9}{sum(errors.values()):>8}{percentile(everything, 50) * 1000:>10.1f}{percentile(everything, 95) * 1000:>10.1f}{percentile(everything, 99) * 1000:>10.1f}{len(everything) / elapsed:>10.1f}")
+
+
+def start_local(latency, token_latency, corpus):
+    # Mock endpoint first: llm reads LLM_ENDPOINT_URL when the app is imported
+    from mock_endpoint import load_outputs, serve
+
+    outputs = load_outputs(corpus) if corpus else None
+    _, endpoint = serve(latency=latency, token_latency=token_latency, outputs=outputs)
+    os.environ["LLM_ENDPOINT_URL"] = endpoint
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import uvicorn
+    from app import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--customers", type=int, default=1000, help="distinct customer ids to draw from")
+    parser.add_argument("--batch-size", type=int, default=6, help="items per /policies/batch request")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--local", action="store_true", help="start the mock endpoint and the app in-process")
+    parser.add_argument("--latency", type=float, default=0.5, help="--local: mock seconds per generation")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="--local: mock seconds per streamed token")
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "corpus", "policy_outputs.json"), help="--local: recorded outputs served by the mock")
+    args = parser.parse_args()
+
+    url = start_local(args.latency, args.token_latency, args.corpus) if args.local else args.url
+    latencies, errors, elapsed = asyncio.run(run(url, args.requests, args.concurrency, args.customers, args.batch_size, args.timeout))
+    report(latencies, errors, elapsed)
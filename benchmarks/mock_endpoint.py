@@ -0,0 +1,91 @@
+"""Offline stand-in for the HuggingFace text-generation endpoint, used by the benchmarks.
+
+Point the app at it with LLM_ENDPOINT_URL. Run standalone from the repository root:
+
+    python benchmarks/mock_endpoint.py --port 8081 --latency 1.5 --token-latency 0.02 --corpus benchmarks/corpus/policy_outputs.json
+"""
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_POLICY = """Pay on delivery: Yes, available for this customer.
+Returnable: Yes, the items can be returned.
+Return Window: 14 days
+Condition of Items: Unused, in the original packaging with tags attached.
+Exceptions and Restrictions: Clearance items are final sale.
+Refunds and Exchanges: Refunds are issued to the original payment method; return shipping is free.
+Additional Notes: Contact support within 48 hours of delivery for damaged items."""
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between requests
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # Seconds before a non-streamed response, and between streamed tokens
+    latency = 0.0
+    token_latency = 0.0
+    outputs = itertools.cycle([CANNED_POLICY])
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        text = next(self.outputs)
+        if payload.get("stream"):
+            return self.stream(text)
+        time.sleep(self.latency)
+        body = json.dumps([{"generated_text": text}]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self, text):
+        # Text-generation-inference style server-sent events, one per token
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for i, token in enumerate(re.findall(r"\S+\s*", text)):
+            time.sleep(self.token_latency)
+            event = {"index": i, "token": {"id": i, "text": token, "logprob": 0.0, "special": False}, "generated_text": None, "details": None}
+            self.wfile.write(b"data:" + json.dumps(event).encode() + b"\n\n")
+            self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_outputs(corpus):
+    with open(corpus) as f:
+        return [entry["text"] for entry in json.load(f)]
+
+
+def serve(host="127.0.0.1", port=0, latency=0.0, token_latency=0.0, outputs=None):
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "latency": latency,
+        "token_latency": token_latency,
+        "outputs": itertools.cycle(outputs or [CANNED_POLICY]),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each non-streamed response")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--corpus", help="JSON corpus of recorded outputs to cycle through instead of the canned policy")
+    args = parser.parse_args()
+
+    outputs = load_outputs(args.corpus) if args.corpus else None
+    server, url = serve(args.host, args.port, args.latency, args.token_latency, outputs)
+    print(f"Mock endpoint listening on {url}")
+    threading.Event().wait()
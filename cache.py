@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Entries kept in each worker's in-memory LRU
+POLICY_CACHE_SIZE = int(os.getenv('POLICY_CACHE_SIZE', '1024'))
+# Seconds a generated policy stays valid
+POLICY_CACHE_TTL = float(os.getenv('POLICY_CACHE_TTL', '3600'))
+# Width of a score bucket; customers in the same bucket share a generated policy
+POLICY_SCORE_BUCKET = float(os.getenv('POLICY_SCORE_BUCKET', '5'))
+# Optional SQLite file shared by every worker on the host
+POLICY_CACHE_PATH = os.getenv('POLICY_CACHE_PATH')
+
+# Sent to the model in place of the customer id and substituted after lookup
+CUSTOMER_PLACEHOLDER = "{customer_id}"
+
+
+def score_bucket(customer_score):
+    # Scores outside 0-100 all get the prompt for the nearest end of the scale, so
+    # they share its bucket instead of each adding a cache key of their own
+    return int(min(100.0, max(0.0, customer_score)) // POLICY_SCORE_BUCKET)
+
+
+def bucket_score(bucket):
+    # Representative score for a bucket: the midpoint of its bounds clamped to the
+    # 0-100 scale, so a score of 100 is not sent to the model as 102.5
+    low = min(100.0, max(0.0, bucket * POLICY_SCORE_BUCKET))
+    high = min(100.0, max(0.0, (bucket + 1) * POLICY_SCORE_BUCKET))
+    return (low + high) / 2
+
+
+def prompt_version(prompt):
+    # Short hash of the fully rendered template, so an edited prompt does not pick up
+    # text generated from the old one in the shared cache
+    text = prompt.format(customer_id=CUSTOMER_PLACEHOLDER, customer_score="{customer_score}")
+    return hashlib.sha256(text.encode()).hexdigest()[:12]
+
+
+class SqliteBackend:
+    """Shared on-disk tier so several workers reuse each other's generations."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS policies (key TEXT PRIMARY KEY, expires REAL, text TEXT)")
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT expires, text FROM policies WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] <= time.time():
+                self.conn.execute("DELETE FROM policies WHERE key = ?", (key,))
+                return None
+        return row
+
+    def set(self, key, expires, text):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO policies VALUES (?, ?, ?)", (key, expires, text))
+
+    def close(self):
+        self.conn.close()
+
+
+class PolicyCache:
+    """LRU + TTL cache of raw policy text keyed on (category, score bucket)."""
+
+    def __init__(self, maxsize=POLICY_CACHE_SIZE, ttl=POLICY_CACHE_TTL, backend=None, versions=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        # category -> prompt version, part of the shared backend key
+        self.versions = versions or {}
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # The shared backend does blocking SQLite I/O, so it runs in a worker thread
+    # rather than on the event loop.
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self.entries[key]
+            entry = None
+        if entry is not None:
+            self.entries.move_to_end(key)
+        elif self.backend is not None:
+            entry = await asyncio.to_thread(self.backend.get, self._backend_key(key))
+            if entry is not None:
+                self._store(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    async def set(self, key, text):
+        expires = time.time() + self.ttl
+        self._store(key, (expires, text))
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.set, self._backend_key(key), expires, text)
+
+    def _backend_key(self, key):
+        # Bucket indexes only mean something for a given bucket width, and the text
+        # only for a given prompt, so workers on another deploy never share entries
+        name, bucket = key
+        return "%s:%s:%g:%d" % (name, self.versions.get(name, ""), POLICY_SCORE_BUCKET, bucket)
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+
+def build_cache(prompts):
+    backend = SqliteBackend(POLICY_CACHE_PATH) if POLICY_CACHE_PATH else None
+    return PolicyCache(backend=backend, versions={name: prompt_version(prompt) for name, prompt in prompts.items()})
@@ -0,0 +1,184 @@
+import asyncio
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from langchain.chains import LLMChain
+from langchain_huggingface import HuggingFaceEndpoint
+
+import metrics
+from cache import CUSTOMER_PLACEHOLDER, bucket_score, build_cache, score_bucket
+
+REPO_ID = "mistralai/Mistral-7B-Instruct-v0.3"
+# Optional dedicated inference endpoint (TGI or a local stub) used instead of the hosted repo
+LLM_ENDPOINT_URL = os.getenv('LLM_ENDPOINT_URL')
+# Per-request budget for a policy generation (seconds), including time spent
+# waiting for a free slot.
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+# Maximum number of generations in flight per worker.
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '16'))
+
+llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+
+
+def build_llm(token=None):
+    target = {"endpoint_url": LLM_ENDPOINT_URL} if LLM_ENDPOINT_URL else {"repo_id": REPO_ID}
+    # The client only takes whole seconds; round up so it never gives up before
+    # LLM_TIMEOUT, which is enforced exactly around the call.
+    timeout = max(1, math.ceil(LLM_TIMEOUT))
+    return HuggingFaceEndpoint(**target, max_new_tokens=700, temperature=0.8, timeout=timeout, huggingfacehub_api_token=token)
+
+
+class ChainRegistry:
+    """Long-lived endpoint client, one compiled chain per policy category and the policy cache, built once in the app lifespan."""
+
+    def __init__(self):
+        self.llm = None
+        self.chains = {}
+        self.executor = None
+        self.cache = None
+
+    def start(self, prompts, token=None):
+        self.llm = build_llm(token)
+        self.chains = {name: LLMChain(llm=self.llm, prompt=prompt) for name, prompt in prompts.items()}
+        # huggingface_hub keeps one requests.Session per thread, so a fixed pool of
+        # worker threads gives every generation a warm keep-alive connection.
+        self.executor = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix="llm")
+        self.cache = build_cache(prompts)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+        self.executor = None
+        self.chains = {}
+        self.llm = None
+        self.cache = None
+
+
+registry = ChainRegistry()
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key."""
+
+    def __init__(self):
+        self.calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self.calls.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller has gone away
+
+
+inflight = SingleFlight()
+
+
+async def _invoke(chain, inputs):
+    await llm_slots.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        future = registry.executor.submit(chain.invoke, inputs)
+    except BaseException:
+        llm_slots.release()
+        raise
+    # A timed-out caller stops waiting but the worker thread keeps generating, so
+    # the slot is only freed once the executor is really done with the call.
+    future.add_done_callback(lambda _: _release_slot(loop))
+    return await asyncio.wrap_future(future)
+
+
+def _release_slot(loop):
+    # Runs on the executor thread; the semaphore belongs to the event loop
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(llm_slots.release)
+
+
+async def run_chain(name, inputs):
+    # Run the chain on the bounded executor so a slow generation never blocks the event loop
+    chain = registry.chains[name]
+    try:
+        return await asyncio.wait_for(_invoke(chain, inputs), timeout=LLM_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Policy generation timed out")
+
+
+async def generate_policy(name, customer_id, customer_score):
+    # The prompt only depends on the category and score, so customers in the same score
+    # bucket share one generation and their id is filled in afterwards.
+    bucket = score_bucket(customer_score)
+    text = await registry.cache.get((name, bucket))
+    if text is None:
+        # Concurrent misses for the same chain inputs share a single generation
+        text = await inflight.do((name, bucket), lambda: _generate(name, bucket))
+    return text.replace(CUSTOMER_PLACEHOLDER, customer_id)
+
+
+async def _generate(name, bucket):
+    with metrics.Timer(metrics.llm_seconds, name):
+        response = await run_chain(name, {"customer_id": CUSTOMER_PLACEHOLDER, "customer_score": bucket_score(bucket)})
+    await registry.cache.set((name, bucket), response['text'])
+    return response['text']
+
+
+async def stream_policy(name, customer_id, customer_score):
+    # Yields the policy text as it is generated, with the customer id filled in.
+    # A cached policy is yielded in one piece; a completed generation is cached.
+    bucket = score_bucket(customer_score)
+    text = await registry.cache.get((name, bucket))
+    if text is not None:
+        yield text.replace(CUSTOMER_PLACEHOLDER, customer_id)
+        return
+
+    prompt = registry.chains[name].prompt.format(customer_id=CUSTOMER_PLACEHOLDER, customer_score=bucket_score(bucket))
+    chunks = []
+    pending = ""
+    # One LLM_TIMEOUT budget covers waiting for a slot and the whole generation. Each
+    # wait is bounded on its own so the deadline never fires while the caller is
+    # still handling a yielded chunk.
+    deadline = asyncio.get_running_loop().time() + LLM_TIMEOUT
+    # Timed until the stream ends, times out, fails or is abandoned by the caller
+    with metrics.Timer(metrics.llm_seconds, name):
+        tokens = registry.llm.astream(prompt)
+        acquired = False
+        try:
+            async with asyncio.timeout_at(deadline):
+                await llm_slots.acquire()
+            acquired = True
+            while True:
+                async with asyncio.timeout_at(deadline):
+                    chunk = await anext(tokens, None)
+                if chunk is None:
+                    break
+                chunks.append(chunk)
+                pending += chunk
+                # Hold back a trailing partial placeholder until the next chunk completes it
+                cut = pending.rfind("{")
+                if cut == -1 or not CUSTOMER_PLACEHOLDER.startswith(pending[cut:]) or pending[cut:] == CUSTOMER_PLACEHOLDER:
+                    cut = len(pending)
+                if cut:
+                    yield pending[:cut].replace(CUSTOMER_PLACEHOLDER, customer_id)
+                    pending = pending[cut:]
+        except TimeoutError:
+            raise HTTPException(status_code=504, detail="Policy generation timed out")
+        finally:
+            await tokens.aclose()
+            if acquired:
+                llm_slots.release()
+    if pending:
+        yield pending.replace(CUSTOMER_PLACEHOLDER, customer_id)
+    await registry.cache.set((name, bucket), "".join(chunks))
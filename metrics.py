@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+
+# Histogram bucket bounds in seconds, from rule/cache hits up to full generations
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Prometheus-style histogram with a fixed label set."""
+
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # label values -> [bucket counts..., sum, count]
+        self.series = defaultdict(lambda: [0] * (len(buckets) + 2))
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series[label_values]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, series in sorted(self.series.items()):
+                labels = ",".join(f'{name}="{value}"' for name, value in zip(self.labels, label_values))
+                sep = "," if labels else ""
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+llm_seconds = Histogram("policy_llm_seconds", "Time waiting for and running the model call, per generation, by how it ended.", ("category", "outcome"))
+parse_seconds = Histogram("policy_parse_seconds", "Time spent parsing model output.", ("category",))
+request_seconds = Histogram("policy_request_seconds", "Total time to produce a policy, by how it ended.", ("category", "source", "outcome"))
+first_field_seconds = Histogram("policy_first_field_seconds", "Time to the first field event on streaming routes.", ("category",))
+
+histograms = (llm_seconds, parse_seconds, request_seconds, first_field_seconds)
+
+
+def outcome(exc):
+    # Outcome label for a block that raised exc, or "ok" when it completed
+    if exc is None:
+        return "ok"
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    if isinstance(exc, TimeoutError) or getattr(exc, "status_code", None) == 504:
+        return "timeout"
+    return "error"
+
+
+class Timer:
+    """Observes the time spent in a with block, labelled with how the block ended.
+
+    labels and outcome can be updated inside the block, e.g. once the policy
+    source is known or when an error is reported instead of raised.
+    """
+
+    def __init__(self, histogram, *labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.outcome = "ok"
+        self.start = None
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, *self.labels, self.outcome if exc is None else outcome(exc))
+        return False
+
+
+def render(counters):
+    """Exposition text for every histogram plus the given {name: (help, value)} counters."""
+    lines = []
+    for name, (help, value) in counters.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} counter", f"{name} {value}"]
+    for histogram in histograms:
+        lines += histogram.render()
+    return "\n".join(lines) + "\n"
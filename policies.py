@@ -0,0 +1,184 @@
+import re
+from dataclasses import dataclass
+
+from langchain.prompts import PromptTemplate
+
+#prompt templates
+general_question = """Generate a single general return policy for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. Include a return window (in days), condition requirements, and any special notes. Be stricter for lower scores and more lenient for higher scores like Longer return window and lenient condition requirements for high score customers. Dont exceed 30 days.Format the output as:
+    Return Window: [X days]
+    Condition Requirements: [requirements]
+    Special Notes: [notes]"""
+
+category_question = """Generate a specific return policy for {category} products for a customer {customer_id} with a trustworthiness score of {customer_score} out of 100. The policy should be lenient for higher scores and stricter for lower scores. Provide the details directly, without headings or redundant information. Limit the response to 3-5 sentences. Ensure the style is consistent across all categories. Format the output as below:
+    Pay on delivery: Whether Available [yes] or [no] for that customer and explain about it.
+    Returnable: Whether available [yes] or [no] for that customer. If [Yes] then only give the below Return Window for that customer.{returnable_note}
+    Return Window: Specify the time frame within which returns are accepted for that customer.
+    Condition of Items: Mention the condition in which items must be returned for that customer.
+    Exceptions and Restrictions: Highlight any exceptions or restrictions that apply for that customer.
+    Refunds and Exchanges: State the policy on refunds and exchanges, including who covers return shipping costs if applicable for that customer.
+    Additional Notes: Include any additional notes relevant to the return policy for that customer.
+    """
+
+general_policy_prompt_template = PromptTemplate(template=general_question, input_variables=["customer_id", "customer_score"])
+category_policy_prompt_template = PromptTemplate(template=category_question, input_variables=["customer_score", "customer_id", "category", "returnable_note"])
+
+# (label in the model output, response key, fallback when the model omits the line)
+general_fields = [
+    ("Return Window", "Return_Window", "14 days"),
+    ("Condition Requirements", "Condition_requirements", "Item must be in original condition"),
+    ("Special Notes", "Special_notes", "No special notes"),
+]
+
+category_fields = [
+    ("Pay on delivery", "Pay_on_delivery", "Yes, this is available for that customer."),
+    ("Returnable", "Returnable", "Yes, the customer can return these items."),
+    ("Return Window", "Return_window", "14 days"),
+    ("Condition of Items", "Condition_of_items", "The items must be in their original packaging and unused for a return to be accepted."),
+    ("Exceptions and Restrictions", "Exceptions", "Items returned after the 14-day window may not be eligible for a refund, but we will provide a replacement at no additional cost."),
+    ("Refunds and Exchanges", "Refunds_exchanges", "We will process refunds within 3-5 business days of receiving the returned item."),
+    ("Additional Notes", "additional_notes", "Please contact us immediately if you notice any issues."),
+]
+
+# One entry per category route. Adding a category only needs a new entry here:
+# the prompt wording, plus any fallbacks that differ from category_fields.
+CATEGORY_CONFIG = {
+    "tv": {
+        "name": "electronics",
+        "category": "Tv, Appliances, Electronics",
+        "returnable_note": " For electronics don't give return for low customer scores, instead give replacement for genuine cases.",
+        "fallbacks": {
+            "Pay on delivery": "Yes, this is available for customer {customer_id}.",
+            "Returnable": "Yes, the customer can return electronics.",
+            "Additional Notes": "For electronics, we recommend checking the product thoroughly upon delivery to ensure it's in working order before signing for it. If you notice any issues, please contact us immediately.",
+        },
+    },
+    "fashion": {
+        "category": "fashion",
+        "fallbacks": {
+            "Pay on delivery": "Yes, this is available for customer {customer_id}.",
+            "Returnable": "Yes, the customer can return fashion.",
+            "Additional Notes": "For Fashion, we recommend checking the product thoroughly upon delivery to ensure it's in right condition before signing for it. If you notice any issues, please contact us immediately.",
+        },
+    },
+    "medicine": {
+        "category": "medicine",
+        "fallbacks": {
+            "Returnable": "Yes, the customer can return medicine provided not opening them.",
+            "Additional Notes": "For medicine, we recommend not opening the items if you notice any issues, please contact us immediately.",
+        },
+    },
+    "beauty": {
+        "category": "beauty and personal",
+        "fallbacks": {
+            "Returnable": "Yes, the customer can return beauty products provided not using them.",
+            "Additional Notes": "For beauty and personal products, we recommend not opening the items if you notice any issues, please contact us immediately.",
+        },
+    },
+    "toy": {
+        "category": "toys and games",
+        "fallbacks": {
+            "Returnable": "Yes, the customer can return toys and games provided not using them.",
+            "Additional Notes": "For toys and games, we recommend not opening the items if you notice any issues, please contact us immediately.",
+        },
+    },
+    "sports": {
+        "category": "sports and outdoors",
+        "fallbacks": {
+            "Returnable": "Yes, the customer can return sports and outdoors provided not using them.",
+            "Additional Notes": "For sports and outdoors, we recommend not opening the items if you notice any issues, please contact us immediately.",
+        },
+    },
+}
+
+
+# Start of a field line: list bullets or numbering and **bold**/__bold__ markers
+# before the label.
+LINE_PREFIX = r"^[ \t*_+\u2022-]*(?:\d+[.)][ \t*_]*)?"
+
+
+@dataclass(frozen=True)
+class PolicyCategory:
+    route: str
+    name: str
+    prompt: PromptTemplate
+    fields: tuple
+    # normalised label -> response key
+    keys: dict
+    # "Label ...: value" lines for this category's labels
+    pattern: re.Pattern
+
+
+def _label_key(label):
+    return " ".join(label.lower().split())
+
+
+def compile_fields(fields):
+    # Known labels, longest first, matched case-insensitively as a prefix so a
+    # qualified label ("Return Window for this customer:", "Pay on delivery (COD):")
+    # still maps to its field. The value is whatever follows the first colon.
+    labels = sorted((label for label, _, _ in fields), key=len, reverse=True)
+    alternatives = "|".join(r"[ \t]+".join(map(re.escape, label.split())) for label in labels)
+    return re.compile(LINE_PREFIX + r"(" + alternatives + r")\b[^:\n]*:(.*)", re.IGNORECASE | re.MULTILINE)
+
+
+def build_category(route, name, prompt, fields):
+    keys = {_label_key(label): key for label, key, _ in fields}
+    return PolicyCategory(route, name, prompt, fields, keys, compile_fields(fields))
+
+
+def build_categories(config):
+    categories = {"general": build_category("general", "general", general_policy_prompt_template, tuple(general_fields))}
+    for route, entry in config.items():
+        prompt = category_policy_prompt_template.partial(category=entry["category"], returnable_note=entry.get("returnable_note", ""))
+        fallbacks = entry.get("fallbacks", {})
+        fields = tuple((label, key, fallbacks.get(label, fallback)) for label, key, fallback in category_fields)
+        categories[route] = build_category(route, entry.get("name", route), prompt, fields)
+    return categories
+
+
+categories = build_categories(CATEGORY_CONFIG)
+
+
+def validate_categories():
+    # Render every prompt once so a broken template fails at startup rather than on a request
+    for category in categories.values():
+        try:
+            category.prompt.format(customer_id="validation", customer_score=50.0)
+        except Exception as exc:
+            raise RuntimeError(f"Prompt for /{category.route} does not render: {exc}") from exc
+
+
+def parse_field(line, category):
+    # (response key, value) for a single completed line, or None if it holds no known field
+    match = category.pattern.match(line)
+    if match is None:
+        return None
+    label, value = match.groups()
+    value = value.strip(" \t\r*_")
+    if not value:
+        return None
+    return category.keys[_label_key(label)], value
+
+
+def parse_policy(text, category, customer_id):
+    """Map every field label in a single pass over the model output.
+
+    Returns the response dict (in field order) and the keys that fell back to defaults.
+    """
+    found = {}
+    for label, value in category.pattern.findall(text):
+        key = category.keys[_label_key(label)]
+        if key not in found:
+            value = value.strip(" \t\r*_")
+            if value:
+                found[key] = value
+
+    policy = {}
+    fallbacks = []
+    for _, key, fallback in category.fields:
+        value = found.get(key)
+        if value is None:
+            value = fallback.replace("{customer_id}", customer_id)
+            fallbacks.append(key)
+        policy[key] = value
+    return policy, fallbacks
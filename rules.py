@@ -0,0 +1,66 @@
+import os
+
+# Set POLICY_RULES=0 to send every request to the model
+POLICY_RULES_ENABLED = os.getenv('POLICY_RULES', '1') != '0'
+
+# Score ranges whose policy is fixed, per category route, answered locally instead
+# of by the model. Each rule is (low, high, fields) and matches low <= score < high.
+# Fields are keyed by response key and {customer_id} is filled in. A field set to
+# None is free text left to the model; a rule should only do that for fields that
+# cannot contradict the ones it fixes, since the model does not see them.
+POLICY_RULES = {
+    "tv": [
+        # Policy decision: low-score electronics customers get replacement only. Every
+        # field follows from that (no return window, no refunds), so the whole policy
+        # is fixed and these requests never call the model.
+        (0, 40, {
+            "Pay_on_delivery": "No, pay on delivery is not available for this customer.",
+            "Returnable": "No. Genuine defects are replaced instead of returned.",
+            "Return_window": "Not applicable. Replacement requests for genuine defects are accepted within 7 days of delivery.",
+            "Condition_of_items": "Items sent for replacement must be in the original packaging with all accessories and the invoice.",
+            "Exceptions": "Physical damage, liquid damage and missing accessories are not covered by a replacement.",
+            "Refunds_exchanges": "No refunds. Approved replacements are shipped at no cost to the customer.",
+            "additional_notes": "Please check the product on delivery and report any defect immediately.",
+        }),
+    ],
+}
+
+def match_rule(route, customer_score):
+    if not POLICY_RULES_ENABLED:
+        return None
+    for low, high, fields in POLICY_RULES.get(route, ()):
+        if low <= customer_score < high:
+            return fields
+    return None
+
+
+def validate_rules(categories):
+    # Checked at startup alongside the prompts
+    for route, rules in POLICY_RULES.items():
+        if route not in categories:
+            raise RuntimeError(f"Policy rules reference unknown category '{route}'")
+        keys = [key for _, key, _ in categories[route].fields]
+        for low, high, fields in rules:
+            if low >= high:
+                raise RuntimeError(f"Empty score range {low}-{high} in rules for /{route}")
+            if sorted(fields) != sorted(keys):
+                raise RuntimeError(f"Rule {low}-{high} for /{route} must set exactly the fields {keys}")
+
+
+def needs_model(fields):
+    return any(value is None for value in fields.values())
+
+
+def fixed_fields(fields, customer_id):
+    return {key: value.replace("{customer_id}", customer_id) for key, value in fields.items() if value is not None}
+
+
+def rule_policy(category, fields, customer_id, generated=None):
+    """Combine a rule's fields with model output for the fields the rule leaves open.
+
+    Returns the policy in field order and the path that produced it: "rules" when
+    no model output was needed, otherwise "hybrid".
+    """
+    fixed = fixed_fields(fields, customer_id)
+    policy = {key: fixed[key] if key in fixed else generated[key] for _, key, _ in category.fields}
+    return policy, "rules" if generated is None else "hybrid"
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import POLICY_SCORE_BUCKET, PolicyCache, SqliteBackend, bucket_score, score_bucket
+
+
+def test_lru_evicts_least_recently_used():
+    async def run():
+        cache = PolicyCache(maxsize=2)
+        await cache.set(("tv", 1), "a")
+        await cache.set(("tv", 2), "b")
+        assert await cache.get(("tv", 1)) == "a"
+        await cache.set(("tv", 3), "c")
+        return cache, [await cache.get(("tv", bucket)) for bucket in (1, 2, 3)]
+
+    cache, texts = asyncio.run(run())
+    assert texts == ["a", None, "c"]
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2}
+
+
+def test_expired_entries_miss():
+    async def run():
+        cache = PolicyCache(ttl=0)
+        await cache.set(("tv", 1), "a")
+        return cache, await cache.get(("tv", 1))
+
+    cache, text = asyncio.run(run())
+    assert text is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "size": 0}
+
+
+def test_sqlite_backend_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "policies.db")
+
+    async def run():
+        writer = PolicyCache(backend=SqliteBackend(path), versions={"tv": "v1"})
+        await writer.set(("tv", 4), "shared")
+        reader = PolicyCache(backend=SqliteBackend(path), versions={"tv": "v1"})
+        other_prompt = PolicyCache(backend=SqliteBackend(path), versions={"tv": "v2"})
+        results = await reader.get(("tv", 4)), await other_prompt.get(("tv", 4))
+        for cache in (writer, reader, other_prompt):
+            cache.close()
+        return reader, results
+
+    reader, (shared, other) = asyncio.run(run())
+    assert shared == "shared"
+    assert other is None
+    # The backend hit is kept in the reader's memory tier
+    assert reader.stats() == {"hits": 1, "misses": 0, "size": 1}
+
+
+def test_sqlite_backend_drops_expired_rows(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "policies.db"))
+    backend.set("tv:v1:5:4", 0, "old")
+    assert backend.get("tv:v1:5:4") is None
+    assert backend.conn.execute("SELECT COUNT(*) FROM policies").fetchone()[0] == 0
+    backend.close()
+
+
+def test_scores_outside_the_scale_share_the_end_buckets():
+    assert score_bucket(200) == score_bucket(1e9) == score_bucket(100)
+    assert score_bucket(-5) == score_bucket(0) == 0
+    assert bucket_score(score_bucket(100)) == 100.0
+    assert bucket_score(score_bucket(87.3)) == (87.3 // POLICY_SCORE_BUCKET + 0.5) * POLICY_SCORE_BUCKET
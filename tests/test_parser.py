@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from policies import categories, parse_field, parse_policy
+
+with open(os.path.join(ROOT, "benchmarks", "corpus", "policy_outputs.json")) as f:
+    CORPUS = json.load(f)
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=[entry["name"] for entry in CORPUS])
+def test_corpus(entry):
+    policy, fallbacks = parse_policy(entry["text"], categories[entry["category"]], "c1")
+    assert {key: value for key, value in policy.items() if key not in fallbacks} == entry["expected"]
+    assert fallbacks == entry["fallbacks"]
+    assert list(policy) == [key for _, key, _ in categories[entry["category"]].fields]
+
+
+def test_fallbacks_fill_customer_id():
+    policy, fallbacks = parse_policy("", categories["tv"], "c42")
+    assert "Pay_on_delivery" in fallbacks
+    assert policy["Pay_on_delivery"] == "Yes, this is available for customer c42."
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Return Window for this customer: 21 days", ("Return_window", "21 days")),
+    ("- **Pay on delivery (COD):** Yes", ("Pay_on_delivery", "Yes")),
+    ("3. RETURNABLE: No", ("Returnable", "No")),
+    ("Return Window - 30 days", None),
+    ("Return Window:", None),
+    ("Return policy: 30 days", None),
+])
+def test_parse_field(line, expected):
+    assert parse_field(line, categories["fashion"]) == expected
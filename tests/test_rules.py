@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from policies import categories
+from rules import POLICY_RULES, match_rule, needs_model, rule_policy, validate_rules
+
+
+def test_shipped_rules_are_valid():
+    validate_rules(categories)
+
+
+def test_low_score_electronics_are_answered_locally():
+    rule = match_rule("tv", 20)
+    assert not needs_model(rule)
+    policy, source = rule_policy(categories["tv"], rule, "c1")
+    assert source == "rules"
+    assert list(policy) == [key for _, key, _ in categories["tv"].fields]
+    assert policy["Returnable"].startswith("No")
+    assert policy["Refunds_exchanges"].startswith("No refunds")
+
+
+def test_scores_outside_a_rule_go_to_the_model():
+    assert match_rule("tv", 40) is None
+    assert match_rule("general", 90) is None
+
+
+def test_hybrid_rules_keep_model_text_for_open_fields():
+    fields = dict(POLICY_RULES["tv"][0][2], additional_notes=None)
+    generated = {key: "generated" for _, key, _ in categories["tv"].fields}
+    policy, source = rule_policy(categories["tv"], fields, "c1", generated=generated)
+    assert source == "hybrid"
+    assert policy["additional_notes"] == "generated"
+    assert policy["Returnable"] == fields["Returnable"]
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm
+from cache import PolicyCache
+from llm import SingleFlight, generate_policy, inflight, registry
+
+
+class StubChain:
+    """Stands in for an LLMChain: counts calls and returns a policy with the placeholder."""
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, inputs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"text": "Returnable: Yes for %s at %s" % (inputs["customer_id"], inputs["customer_score"])}
+
+
+@pytest.fixture
+def stub_registry():
+    chain = StubChain()
+    registry.chains = {"tv": chain}
+    registry.executor = ThreadPoolExecutor(max_workers=4)
+    registry.cache = PolicyCache()
+    yield chain
+    registry.close()
+
+
+def test_concurrent_misses_share_one_generation(stub_registry):
+    async def run():
+        return await asyncio.gather(*(generate_policy("tv", f"c{i}", 41) for i in range(5)))
+
+    coalesced = inflight.coalesced
+    texts = asyncio.run(run())
+    assert stub_registry.calls == 1
+    assert inflight.coalesced - coalesced == 4
+    # Every caller gets the shared text with its own id filled in
+    assert texts == [f"Returnable: Yes for c{i} at 42.5" for i in range(5)]
+    assert inflight.calls == {}
+
+
+def test_completed_generation_is_served_from_the_cache(stub_registry):
+    async def run():
+        await generate_policy("tv", "c1", 41)
+        return await generate_policy("tv", "c2", 44)
+
+    assert asyncio.run(run()) == "Returnable: Yes for c2 at 42.5"
+    assert stub_registry.calls == 1
+    assert registry.cache.stats()["hits"] == 1
+
+
+def test_failure_reaches_every_caller_and_is_not_cached(stub_registry):
+    stub_registry.error = RuntimeError("endpoint down")
+
+    async def run():
+        return await asyncio.gather(*(generate_policy("tv", f"c{i}", 41) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [str(result) for result in results] == ["endpoint down"] * 3
+    assert stub_registry.calls == 1
+    assert registry.cache.stats()["size"] == 0
+
+
+def test_slot_is_held_until_the_worker_finishes(stub_registry, monkeypatch):
+    stub_registry.delay = 0.3
+    monkeypatch.setattr(llm, "LLM_TIMEOUT", 0.05)
+
+    async def run():
+        free = llm.llm_slots._value
+        with pytest.raises(Exception) as timed_out:
+            await generate_policy("tv", "c1", 41)
+        held = free - llm.llm_slots._value
+        await asyncio.sleep(0.4)
+        return timed_out.value, held, free - llm.llm_slots._value
+
+    error, held, still_held = asyncio.run(run())
+    assert getattr(error, "status_code", None) == 504
+    assert (held, still_held) == (1, 0)
+
+
+def test_distinct_keys_do_not_share():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def run():
+        return await asyncio.gather(*(flight.do(key, lambda key=key: work(key)) for key in ("a", "b", "a")))
+
+    assert asyncio.run(run()) == ["a", "b", "a"]
+    assert sorted(calls) == ["a", "b"]
+    assert flight.coalesced == 1